@@ -1,8 +1,93 @@
+import copy
 import fitz
+import functools
+import hashlib
 import json
+import numpy as np
+import os
+import pickle
 import re
+import sys
 from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 import argparse
+import cProfile
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_LETTER_RE = re.compile(r'[a-zA-Z]')
+_TITLE_EXT_RE = re.compile(r'\.(pdf|docx?|pptx?|xlsx?|cdr)$', re.I)
+_WINPATH_RE = re.compile(r'^[a-zA-Z]:\\')
+
+# Only text blocks are ever read, so skip decoding embedded images into the dict output
+_TEXT_FLAGS = fitz.TEXTFLAGS_DICT & ~fitz.TEXT_PRESERVE_IMAGES
+
+# Documents above this page count have their lines reconstructed in a process pool.
+# Each extra worker costs roughly 40-120 ms (fork, reopening the PDF, pickling lines)
+# against about 4 ms per page, so smaller documents are faster sequentially.
+_PARALLEL_MIN_PAGES = 50
+
+# Persistent outline cache for batch runs
+_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "pdf_outline")
+
+@functools.lru_cache(maxsize=None)
+def _extractor_version() -> str:
+    """Fingerprints this file and PyMuPDF so cached outlines expire when either changes."""
+    with open(__file__, 'rb') as f:
+        digest = hashlib.sha1(f.read())
+    digest.update(fitz.VersionBind.encode("utf-8"))
+    return digest.hexdigest()
+
+def _join_spans(spans: list) -> str:
+    """Joins the stripped, non-empty texts of spans with single spaces."""
+    parts = []
+    append = parts.append
+    for span in spans:
+        text = span['text'].strip()
+        if text:
+            append(text)
+    return " ".join(parts)
+
+def _list_prefix_depth(text: str):
+    r"""
+    Scans for a numbering prefix such as "2.1 " and returns its number of dots.
+
+    Equivalent to matching r'^\s*(\d+(\.\d+)*)\s+', without the regex engine;
+    returns None when the text is not numbered.
+    """
+    i, n = 0, len(text)
+    while i < n and text[i].isspace():
+        i += 1
+    start = i
+    while i < n and text[i].isdecimal():
+        i += 1
+    if i == start:
+        return None
+    dots = 0
+    while i + 1 < n and text[i] == '.' and text[i + 1].isdecimal():
+        dots += 1
+        i += 1
+        while i < n and text[i].isdecimal():
+            i += 1
+    if i < n and text[i].isspace():
+        return dots
+    return None
+
+def _group_spans(xs: np.ndarray, ys: np.ndarray):
+    """
+    Orders spans top-to-bottom, left-to-right by their quantized line position.
+
+    Returns the sort order and the position in it where every visual line starts.
+    """
+    # Integer bucket index of the 5pt grid; same rounding as round(y / 5.0)
+    y_q = np.rint(ys / 5.0).astype(np.int64)
+    order = np.lexsort((xs, y_q))
+    _, starts = np.unique(y_q[order], return_index=True)
+    return order, starts
 
 class PDFOutlineExtractor:
     """
@@ -13,14 +98,17 @@ class PDFOutlineExtractor:
     including articles, reports, and forms.
     """
 
+    url_pattern = re.compile(r'https?://\S+')
+
     def __init__(self, pdf_path: str):
         """
         Initializes the extractor with the path to the PDF file.
         """
         try:
-            if len(pdf_path) > 260 and re.match(r'^[a-zA-Z]:\\', pdf_path):
+            if len(pdf_path) > 260 and _WINPATH_RE.match(pdf_path):
                  pdf_path = "\\\\?\\" + pdf_path
             self.doc = fitz.open(pdf_path)
+            self.pdf_path = pdf_path
         except Exception as e:
             raise FileNotFoundError(f"Error opening or reading PDF file: {e}")
 
@@ -28,17 +116,34 @@ class PDFOutlineExtractor:
         self.page_margin_bottom = 0.92
         self.min_heading_length = 3
         self.max_heading_length = 300
+        self._bold_cache = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Releases the underlying MuPDF document; safe to call more than once."""
+        if not self.doc.is_closed:
+            self.doc.close()
 
     def _is_bold_by_name(self, font_name: str) -> bool:
         """Checks if a font name suggests it is bold for better accuracy."""
-        return any(x in font_name.lower() for x in ['bold', 'black', 'heavy', 'condb', 'cbi'])
+        is_bold = self._bold_cache.get(font_name)
+        if is_bold is None:
+            name = font_name.lower()
+            is_bold = 'bold' in name or 'black' in name or 'heavy' in name or 'condb' in name or 'cbi' in name
+            self._bold_cache[font_name] = is_bold
+        return is_bold
 
     def _extract_title(self) -> str:
         """
         Extracts the document title using a robust hybrid approach.
         """
         if self.doc.metadata and (title := self.doc.metadata.get("title", "").strip()):
-            if len(title) > 4 and not re.search(r'\.(pdf|docx?|pptx?|xlsx?|cdr)$', title, re.I) and "Microsoft Word" not in title:
+            if len(title) > 4 and not _TITLE_EXT_RE.search(title) and "Microsoft Word" not in title:
                 return title
 
         if not self.doc or self.doc.page_count == 0:
@@ -46,15 +151,27 @@ class PDFOutlineExtractor:
 
         first_page = self.doc[0]
         top_rect = fitz.Rect(0, 0, first_page.rect.width, first_page.rect.height * 0.5)
-        
-        blocks = first_page.get_text("dict", clip=top_rect).get('blocks', [])
-        
+        # Page 0 is extracted again, clipped, by _reconstruct_lines. MuPDF's clip keeps or drops
+        # each glyph by rules a span-level filter over one unclipped dict cannot reproduce.
+        return self._extract_title_from_blocks(self._page_blocks(first_page, clip=top_rect))
+
+    @staticmethod
+    def _page_blocks(page, clip=None) -> list:
+        """Extracts the text blocks of a page from one TextPage built with _TEXT_FLAGS."""
+        tp = page.get_textpage(clip=clip, flags=_TEXT_FLAGS)
+        return page.get_text("dict", clip=clip, textpage=tp).get('blocks', [])
+
+    def _extract_title_from_blocks(self, blocks: list) -> str:
+        """
+        Picks the title from the largest-font text among blocks already limited to
+        the top half of the first page.
+        """
         font_sizes = defaultdict(list)
         for block in blocks:
             if block['type'] == 0:
                 for line in block['lines']:
-                    line_text = " ".join(span['text'].strip() for span in line['spans'] if span['text'].strip()).strip()
-                    if line_text and re.search('[a-zA-Z]', line_text):
+                    line_text = _join_spans(line['spans'])
+                    if line_text and _LETTER_RE.search(line_text):
                         if line['spans']:
                              avg_size = round(sum(s['size'] for s in line['spans']) / len(line['spans']))
                              font_sizes[avg_size].append(line_text)
@@ -68,26 +185,61 @@ class PDFOutlineExtractor:
 
     def _reconstruct_lines(self):
         """Reconstructs all lines from the document into a structured list, merging spans."""
+        page_count = self.doc.page_count
+        workers = min(os.cpu_count() or 1, page_count // _PARALLEL_MIN_PAGES + 1)
+        if page_count <= _PARALLEL_MIN_PAGES or workers < 2:
+            return self._reconstruct_page_range(0, page_count)
+
+        # PyMuPDF is not thread-safe, so split the pages across processes that
+        # each open their own copy of the document.
+        step = -(-page_count // workers)
+        ranges = [(start, min(start + step, page_count)) for start in range(0, page_count, step)]
+        margins = (self.page_margin_top, self.page_margin_bottom)
+        try:
+            with ProcessPoolExecutor(max_workers=len(ranges) - 1) as pool:
+                futures = [pool.submit(_reconstruct_lines_worker, self.pdf_path, start, stop, margins) for start, stop in ranges[1:]]
+                # The first range stays in this process, which saves starting one more worker
+                all_lines = self._reconstruct_page_range(*ranges[0])
+                for future in futures:
+                    all_lines.extend(future.result())
+                return all_lines
+        except (OSError, BrokenProcessPool, pickle.PicklingError):
+            # PicklingError: the worker cannot be sent by name, e.g. when this file was
+            # loaded without being registered in sys.modules
+            return self._reconstruct_page_range(0, page_count)
+
+    def _reconstruct_page_range(self, start: int, stop: int) -> list:
+        """Reconstructs the lines of pages [start, stop) in reading order."""
         all_lines = []
-        for page_num, page in enumerate(self.doc):
+        for page_num in range(start, stop):
+            page = self.doc[page_num]
             content_rect = fitz.Rect(0, page.rect.height * self.page_margin_top, page.rect.width, page.rect.height * self.page_margin_bottom)
-            blocks = page.get_text("dict", clip=content_rect).get("blocks", [])
+            blocks = self._page_blocks(page, clip=content_rect)
             
-            lines_on_page = defaultdict(list)
+            page_spans, xs, ys = [], [], []
             for block in blocks:
                 if block['type'] == 0:
                     for line in block['lines']:
                         # Group spans by a quantized vertical position to merge lines accurately
-                        y0 = round(line['bbox'][1] / 5.0) * 5.0
-                        lines_on_page[y0].extend(line['spans'])
-            
-            for y0 in sorted(lines_on_page.keys()):
-                spans = lines_on_page[y0]
-                if not spans: continue
-                
-                spans.sort(key=lambda s: s['bbox'][0])
-                
-                line_text = " ".join(span['text'].strip() for span in spans if span['text'].strip()).strip()
+                        y0 = line['bbox'][1]
+                        for span in line['spans']:
+                            page_spans.append(span)
+                            xs.append(span['bbox'][0])
+                            ys.append(y0)
+            # Release the page handle and the block/line wrappers of its dict; the span
+            # dicts themselves stay alive in page_spans until the lines are built
+            del page, blocks
+            if not page_spans:
+                continue
+
+            order, starts = _group_spans(np.asarray(xs), np.asarray(ys))
+            order = order.tolist()
+            bounds = starts.tolist() + [len(order)]
+
+            for start, end in zip(bounds, bounds[1:]):
+                spans = [page_spans[i] for i in order[start:end]]
+
+                line_text = _join_spans(spans)
                 if not line_text: continue
                 
                 first_span = spans[0]
@@ -95,6 +247,8 @@ class PDFOutlineExtractor:
                 
                 all_lines.append({
                     'text': line_text,
+                    # Counted here so _classify_styles never re-splits the text
+                    'word_count': len(line_text.split()),
                     'style': style,
                     'page_num': page_num + 1,
                 })
@@ -108,47 +262,42 @@ class PDFOutlineExtractor:
         if not lines:
             return {}
 
-        style_profiles = defaultdict(lambda: {'count': 0, 'total_words': 0})
+        style_counts = Counter(line['style'] for line in lines)
+        style_words = Counter()
         for line in lines:
-            style = line['style']
-            style_profiles[style]['count'] += 1
-            style_profiles[style]['total_words'] += len(line['text'].split())
+            style_words[line['style']] += line['word_count']
 
-        if not style_profiles:
+        if not style_counts:
             return {}
 
-        for style, profile in style_profiles.items():
-            profile['avg_words'] = profile['total_words'] / profile['count']
+        avg_words = {style: style_words[style] / count for style, count in style_counts.items()}
 
-        non_heading_styles = {s for s, p in style_profiles.items() if p['avg_words'] > 20}
+        non_heading_styles = {s for s, avg in avg_words.items() if avg > 20}
         try:
-            body_style_candidate = Counter({s: p['count'] for s, p in style_profiles.items() if s not in non_heading_styles}).most_common(1)[0][0]
+            body_style_candidate = Counter({s: c for s, c in style_counts.items() if s not in non_heading_styles}).most_common(1)[0][0]
         except IndexError:
             return {}
 
-        heading_candidates = []
-        for style, profile in style_profiles.items():
+        # Style keys are unique, so candidates can be grouped by size as they are found
+        size_groups = defaultdict(list)
+        for style in style_counts:
             is_candidate = style[0] > body_style_candidate[0] or \
                            (style[0] == body_style_candidate[0] and style[1] and not body_style_candidate[1])
             if not is_candidate:
                 continue
 
-            if profile['avg_words'] > 15:
+            if avg_words[style] > 15:
                 continue
             
-            heading_candidates.append(style)
+            size_groups[style[0]].append(style)
         
-        if not heading_candidates:
+        if not size_groups:
             return {}
         
-        largest_heading_size = max(s[0] for s in heading_candidates)
+        largest_heading_size = max(size_groups)
         if largest_heading_size < body_style_candidate[0] * 1.15:
             return {}
 
-        size_groups = defaultdict(list)
-        for size, bold in set(heading_candidates):
-            size_groups[size].append((size, bold))
-
         sorted_sizes = sorted(size_groups.keys(), reverse=True)
         
         style_to_level = {}
@@ -166,15 +315,15 @@ class PDFOutlineExtractor:
         """
         Orchestrates the entire outline extraction process using a robust pipeline.
         """
-        title = self._extract_title()
-        
+        # An embedded TOC is authoritative, so check it before any text extraction
         toc = self.doc.get_toc()
         if toc:
             outline = [{"level": f"H{level}", "text": text.strip(), "page": page} for level, text, page in toc if 1 <= level <= 4]
-            outline = [h for h in outline if re.search('[a-zA-Z]', h['text'])]
+            outline = [h for h in outline if _LETTER_RE.search(h['text'])]
             if outline:
-                 return {"title": title, "outline": outline}
+                 return {"title": self._extract_title(), "outline": outline}
 
+        title = self._extract_title()
         all_lines = self._reconstruct_lines()
         style_to_level = self._classify_styles(all_lines)
         
@@ -182,63 +331,179 @@ class PDFOutlineExtractor:
             return {"title": title, "outline": []}
             
         outline = []
-        url_pattern = re.compile(r'https?://\S+')
-        toc_pattern = re.compile(r'\.{4,}')
-        list_item_pattern = re.compile(r'^\s*(\d+(\.\d+)*)\s+')
+        seen = set()
+        url_pattern = self.url_pattern
 
         for line in all_lines:
+            # Most lines are body text; the dict lookup rejects them before any string work
+            level = style_to_level.get(line['style'])
+            if level is None:
+                continue
+
             line_text = line['text']
             
-            if not (self.min_heading_length <= len(line_text) <= self.max_heading_length) or url_pattern.match(line_text):
+            if not (self.min_heading_length <= len(line_text) <= self.max_heading_length):
                 continue
             
-            if toc_pattern.search(line_text):
+            # Dot leaders of TOC entries; a substring test is all r'\.{4,}' needs
+            if '....' in line_text:
+                continue
+
+            # Only lines that look like a URL are handed to the regex
+            if line_text.startswith(('http://', 'https://')) and url_pattern.match(line_text):
+                continue
+
+            clean_text = ' '.join(line_text.split())
+
+            if level == 'H1' and line['page_num'] == 1 and clean_text == title:
                 continue
             
-            if line['style'] in style_to_level:
-                level = style_to_level[line['style']]
-                clean_text = ' '.join(line_text.split())
+            dot_count = _list_prefix_depth(clean_text)
+            if dot_count is not None:
+                # Refine level based on numbering
+                if dot_count == 0: level = 'H1'
+                elif dot_count == 1: level = 'H2'
+                elif dot_count == 2: level = 'H3'
+                else: level = 'H4'
 
-                if level == 'H1' and line['page_num'] == 1 and clean_text == title:
-                    continue
-                
-                match = list_item_pattern.match(clean_text)
-                if match:
-                    num_str = match.group(1).strip()
-                    dot_count = num_str.count('.')
-                    # Refine level based on numbering
-                    if dot_count == 0: level = 'H1'
-                    elif dot_count == 1: level = 'H2'
-                    elif dot_count == 2: level = 'H3'
-                    else: level = 'H4'
-
-                if not any(o['text'] == clean_text and o['page'] == line['page_num'] for o in outline):
-                    outline.append({
-                        "level": level,
-                        "text": clean_text,
-                        "page": line['page_num']
-                    })
+            key = (clean_text, line['page_num'])
+            if key not in seen:
+                seen.add(key)
+                outline.append({
+                    "level": level,
+                    "text": clean_text,
+                    "page": line['page_num']
+                })
 
         return {"title": title, "outline": outline}
 
+    @classmethod
+    def cached_outline(cls, pdf_path: str) -> dict:
+        """
+        Returns the outline of pdf_path, reusing earlier results for an unchanged file.
+
+        Results are kept in memory for the process and on disk under _CACHE_DIR
+        so repeated batch runs skip extraction entirely.
+        """
+        stat = os.stat(pdf_path)
+        title, outline = cls._outline_for(os.path.abspath(pdf_path), stat.st_mtime_ns, stat.st_size)
+        # The lru_cache hands every caller the same entry dicts, so give each one its own copy
+        return {"title": title, "outline": copy.deepcopy(outline)}
+
+    @classmethod
+    @functools.lru_cache(maxsize=32)
+    def _outline_for(cls, pdf_path: str, mtime_ns: int, size: int) -> tuple:
+        """Extracts (title, outline) for one version of a file, backed by the disk cache."""
+        key = hashlib.sha1(f"{_extractor_version()}|{pdf_path}|{mtime_ns}|{size}".encode("utf-8")).hexdigest()
+        cache_file = os.path.join(_CACHE_DIR, f"{key}.json")
+        try:
+            with open(cache_file, 'rb') as f:
+                cached = json.loads(f.read())
+            # Anything but the object written below is treated as a miss and overwritten
+            if isinstance(cached, dict) and isinstance(cached.get("outline"), list):
+                return cached["title"], cached["outline"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+        with cls(pdf_path) as extractor:
+            result = extractor.extract_outline()
+        try:
+            os.makedirs(_CACHE_DIR, exist_ok=True)
+            tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+            with open(tmp_file, 'wb') as f:
+                f.write(_dumps(result))
+            os.replace(tmp_file, cache_file)
+        except OSError:
+            pass
+        return result["title"], result["outline"]
+
+
+def _reconstruct_lines_worker(pdf_path: str, start: int, stop: int, margins: tuple) -> list:
+    """Process-pool entry point: reconstructs a page range from a private document handle."""
+    with PDFOutlineExtractor(pdf_path) as extractor:
+        extractor.page_margin_top, extractor.page_margin_bottom = margins
+        return extractor._reconstruct_page_range(start, stop)
+
+
+def _dumps(obj) -> bytes:
+    """Serializes obj as 2-space indented UTF-8 JSON, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    return json.dumps(obj, indent=2, ensure_ascii=False).encode('utf-8')
+
+
+# Sampling profilers attach from outside the process, so for them main only prints
+# the command to run. On typical documents the time goes to MuPDF text extraction
+# (_page_blocks -> get_text) and the span loop in _reconstruct_page_range.
+_EXTERNAL_PROFILERS = {
+    'pyspy': "py-spy record -o profile.svg -- python {script} {pdf}",
+    'scalene': "scalene {script} {pdf}",
+}
+
+
+def _run_batch(input_dir: str, output_dir: str):
+    """Writes <name>.json into output_dir for every PDF in input_dir, using the outline cache."""
+    os.makedirs(output_dir, exist_ok=True)
+    for name in sorted(os.listdir(input_dir)):
+        if not name.lower().endswith(".pdf"):
+            continue
+        try:
+            document_outline = PDFOutlineExtractor.cached_outline(os.path.join(input_dir, name))
+        except Exception as e:
+            print(f"An error occurred processing {name}: {e}")
+            continue
+
+        output_path = os.path.join(output_dir, os.path.splitext(name)[0] + ".json")
+        with open(output_path, 'wb') as f:
+            f.write(_dumps(document_outline))
+        print(f"Successfully extracted outline to {output_path}")
+
 
 def main():
     parser = argparse.ArgumentParser(description="Extract a structured outline from a PDF file.")
-    parser.add_argument("pdf_path", type=str, help="Path to the input PDF file.")
-    parser.add_argument("-o", "--output", type=str, help="Path to the output JSON file.")
+    parser.add_argument("pdf_path", type=str, help="Path to the input PDF file, or a directory with --batch.")
+    parser.add_argument("-o", "--output", type=str, help="Path to the output JSON file, or the output directory with --batch.")
+    parser.add_argument("--batch", action="store_true", help="Process every PDF in the pdf_path directory, caching results.")
+    parser.add_argument("--profile", choices=["cprofile", "pyspy", "scalene"], help="Profile the outline extraction.")
+    parser.add_argument("--profile-out", type=str, default="outline.prof", help="Where --profile cprofile writes its stats.")
     args = parser.parse_args()
 
+    if args.batch and args.profile:
+        parser.error("--profile cannot be combined with --batch")
+
+    if args.batch:
+        # Check the input first, since without -o the output directory is the input directory
+        if not os.path.isdir(args.pdf_path):
+            parser.error(f"--batch expects an existing directory, got: {args.pdf_path}")
+        try:
+            _run_batch(args.pdf_path, args.output or args.pdf_path)
+        except OSError as e:
+            print(f"An error occurred: {e}")
+        return
+
+    if args.profile in _EXTERNAL_PROFILERS:
+        command = _EXTERNAL_PROFILERS[args.profile].format(script=sys.argv[0], pdf=args.pdf_path)
+        print(f"Run the extractor under {args.profile} with: {command}", file=sys.stderr)
+
     try:
-        extractor = PDFOutlineExtractor(args.pdf_path)
-        document_outline = extractor.extract_outline()
-        json_output = json.dumps(document_outline, indent=2, ensure_ascii=False)
+        with PDFOutlineExtractor(args.pdf_path) as extractor:
+            if args.profile == "cprofile":
+                profiler = cProfile.Profile()
+                profiler.enable()
+                document_outline = extractor.extract_outline()
+                profiler.disable()
+                profiler.dump_stats(args.profile_out)
+                print(f"Wrote cProfile stats to {args.profile_out}", file=sys.stderr)
+            else:
+                document_outline = extractor.extract_outline()
+        json_output = _dumps(document_outline)
 
         if args.output:
-            with open(args.output, 'w', encoding='utf-8') as f:
+            with open(args.output, 'wb') as f:
                 f.write(json_output)
             print(f"Successfully extracted outline to {args.output}")
         else:
-            print(json_output)
+            print(json_output.decode('utf-8'))
 
     except Exception as e:
         print(f"An error occurred: {e}")
@@ -0,0 +1,78 @@
+import importlib.util
+import os
+import sys
+import tempfile
+import unittest
+
+import fitz
+
+_spec = importlib.util.spec_from_file_location(
+    "outline_1a", os.path.join(os.path.dirname(__file__), os.pardir, "1A.py"))
+if "outline_1a" not in sys.modules:
+    # Registered so process-pool workers can pickle the module's functions by name
+    sys.modules["outline_1a"] = importlib.util.module_from_spec(_spec)
+    _spec.loader.exec_module(sys.modules["outline_1a"])
+outline_1a = sys.modules["outline_1a"]
+PDFOutlineExtractor = outline_1a.PDFOutlineExtractor
+
+
+def _line_texts(blocks):
+    return {"".join(span['text'] for span in line['spans']).strip()
+            for block in blocks if block['type'] == 0 for line in block['lines']}
+
+
+class Page0ClippingTest(unittest.TestCase):
+    """Page 0 must be cut at the title and margin lines exactly as MuPDF's clip= does."""
+
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        doc = fitz.open()
+        page = doc.new_page(width=612, height=792)
+        page.insert_text((72, 120), "Real Document Title", fontsize=28)
+        # Only the ascender area of this line reaches above the 50% title line
+        page.insert_text((72, 436), "Chapter One Banner", fontsize=40)
+        # Only the descender of this line reaches below the 8% top margin
+        page.insert_text((72, 60), "Small Header Top", fontsize=24)
+        # Only the ascender area of this line reaches above the 92% bottom margin
+        page.insert_text((72, 737), "Footer Leak Line", fontsize=10)
+        for i in range(20):
+            page.insert_text((72, 150 + i * 12), f"body text line with several words in it number {i}", fontsize=10)
+        pdf_path = os.path.join(tmpdir.name, "page0.pdf")
+        doc.save(pdf_path)
+        doc.close()
+
+        self.extractor = PDFOutlineExtractor(pdf_path)
+        self.addCleanup(self.extractor.close)
+        self.page = self.extractor.doc[0]
+
+    def _unclipped_bbox(self, text):
+        for block in self.page.get_text("dict")['blocks']:
+            for line in block.get('lines', []):
+                if "".join(span['text'] for span in line['spans']).strip() == text:
+                    return fitz.Rect(line['bbox'])
+        self.fail(f"{text!r} not found on the page")
+
+    def test_cases_only_graze_the_band_edges(self):
+        height = self.page.rect.height
+        self.assertLess(self._unclipped_bbox("Chapter One Banner").y0, height * 0.5)
+        self.assertGreater(self._unclipped_bbox("Small Header Top").y1, height * 0.08)
+        self.assertLess(self._unclipped_bbox("Footer Leak Line").y0, height * 0.92)
+
+    def test_title_ignores_ascender_over_midline(self):
+        top_rect = fitz.Rect(0, 0, self.page.rect.width, self.page.rect.height * 0.5)
+        self.assertNotIn("Chapter One Banner", _line_texts(self.page.get_text("dict", clip=top_rect)['blocks']))
+        self.assertEqual(self.extractor._extract_title(), "Real Document Title")
+
+    def test_content_band_matches_real_clip(self):
+        height = self.page.rect.height
+        content_rect = fitz.Rect(0, height * 0.08, self.page.rect.width, height * 0.92)
+        expected = _line_texts(self.page.get_text("dict", clip=content_rect)['blocks'])
+        reconstructed = {line['text'] for line in self.extractor._reconstruct_lines()}
+        self.assertEqual(reconstructed, expected)
+        self.assertNotIn("Small Header Top", reconstructed)
+        self.assertNotIn("Footer Leak Line", reconstructed)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import importlib.util
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import fitz
+
+_spec = importlib.util.spec_from_file_location(
+    "outline_1a", os.path.join(os.path.dirname(__file__), os.pardir, "1A.py"))
+if "outline_1a" not in sys.modules:
+    # Registered so process-pool workers can pickle the module's functions by name
+    sys.modules["outline_1a"] = importlib.util.module_from_spec(_spec)
+    _spec.loader.exec_module(sys.modules["outline_1a"])
+outline_1a = sys.modules["outline_1a"]
+PDFOutlineExtractor = outline_1a.PDFOutlineExtractor
+
+_SAMPLE_PDF = os.path.join(os.path.dirname(__file__), os.pardir, "file03.pdf")
+
+
+class ReconstructLinesPoolTest(unittest.TestCase):
+    """The process-pool path must give the sequential result, even on a single-CPU host."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls._tmpdir = tempfile.TemporaryDirectory()
+        sample = fitz.open(_SAMPLE_PDF)
+        doc = fitz.open()
+        while doc.page_count <= outline_1a._PARALLEL_MIN_PAGES:
+            doc.insert_pdf(sample)
+        cls.pdf_path = os.path.join(cls._tmpdir.name, "long.pdf")
+        doc.save(cls.pdf_path)
+        cls.page_count = doc.page_count
+        doc.close()
+        sample.close()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._tmpdir.cleanup()
+
+    def setUp(self):
+        self.extractor = PDFOutlineExtractor(self.pdf_path)
+        self.addCleanup(self.extractor.close)
+        self.sequential = self.extractor._reconstruct_page_range(0, self.page_count)
+        cpu_patch = mock.patch.object(outline_1a.os, "cpu_count", return_value=4)
+        cpu_patch.start()
+        self.addCleanup(cpu_patch.stop)
+
+    def _spy_page_ranges(self):
+        return mock.patch.object(PDFOutlineExtractor, "_reconstruct_page_range", autospec=True,
+                                 side_effect=PDFOutlineExtractor._reconstruct_page_range)
+
+    def test_pool_matches_sequential(self):
+        with self._spy_page_ranges() as spy:
+            lines = self.extractor._reconstruct_lines()
+        self.assertEqual(lines, self.sequential)
+        # Only the first range ran in this process; a full (0, page_count) call means the pool fell back
+        (first_call,) = spy.call_args_list
+        self.assertEqual(first_call.args[1], 0)
+        self.assertLess(first_call.args[2], self.page_count)
+
+    def test_unpicklable_worker_falls_back_to_sequential(self):
+        with mock.patch.dict(sys.modules), self._spy_page_ranges() as spy:
+            del sys.modules["outline_1a"]
+            lines = self.extractor._reconstruct_lines()
+        self.assertEqual(lines, self.sequential)
+        self.assertEqual(spy.call_args_list[-1].args[1:], (0, self.page_count))
+
+
+if __name__ == "__main__":
+    unittest.main()